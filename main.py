@@ -1,16 +1,28 @@
-from fastapi import FastAPI, Form, File, UploadFile, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
 from fastapi.staticfiles import StaticFiles
+from starlette.requests import ClientDisconnect
+import aiohttp
 import asyncpg
 import asyncio
-from azure.storage.blob import BlobServiceClient
-from azure.servicebus import ServiceBusClient, ServiceBusMessage
-from azure.keyvault.secrets import SecretClient
-from azure.identity import DefaultAzureCredential
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+from azure.core.exceptions import AzureError, ResourceExistsError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob.aio import BlobServiceClient
+from azure.servicebus import ServiceBusMessage, ServiceBusMessageBatch
+from azure.servicebus.aio import ServiceBusClient
+from azure.servicebus.exceptions import MessageSizeExceededError
+from azure.keyvault.secrets.aio import SecretClient
+from azure.identity.aio import ChainedTokenCredential, EnvironmentCredential, ManagedIdentityCredential
 import os
+import gzip
+import hashlib
+import time
 import uuid
-from datetime import datetime
-import json
+from datetime import datetime, timezone
+from pathlib import Path
+import orjson
 import logging
 
 # Configure logging
@@ -19,47 +31,258 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Form Submission App", description="Simple form submission with Azure integration")
 
-# Azure Key Vault setup
-credential = DefaultAzureCredential()
+# Static assets, with the form page loaded once and served as prebuilt bytes
+STATIC_DIR = Path(__file__).parent / "static"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+INDEX_BYTES = (STATIC_DIR / "index.html").read_bytes()
+INDEX_DIGEST = hashlib.md5(INDEX_BYTES).hexdigest()
+INDEX_ETAG = f'"{INDEX_DIGEST}"'
+INDEX_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "Vary": "Accept-Encoding",
+    "ETag": INDEX_ETAG
+}
+INDEX_RESPONSE = Response(content=INDEX_BYTES, media_type="text/html", headers=INDEX_HEADERS)
+
+# Gzip variant compressed once at import, with its own ETag per RFC 9110
+INDEX_GZIP_BYTES = gzip.compress(INDEX_BYTES, 9)
+INDEX_GZIP_ETAG = f'"{INDEX_DIGEST}-gzip"'
+INDEX_GZIP_HEADERS = {**INDEX_HEADERS, "Content-Encoding": "gzip", "ETag": INDEX_GZIP_ETAG}
+INDEX_GZIP_RESPONSE = Response(content=INDEX_GZIP_BYTES, media_type="text/html", headers=INDEX_GZIP_HEADERS)
+
+# Azure Key Vault setup, probing only the credential sources available in our deployments
+credential = ChainedTokenCredential(
+    EnvironmentCredential(),
+    ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID"))
+)
 key_vault_url = os.getenv("KEY_VAULT_URL", "https://your-keyvault.vault.azure.net/")
-secret_client = SecretClient(vault_url=key_vault_url, credential=credential)
+
+# Key Vault secrets cached by name as (value, expires_at) on the monotonic clock
+SECRET_CACHE_TTL = float(os.getenv("SECRET_CACHE_TTL", "3600"))
+secret_cache = {}
 
 # Global variables to store connections
+http_session = None
+secret_client = None
 db_pool = None
 blob_service_client = None
+container_client = None
 servicebus_client = None
+servicebus_sender = None
+servicebus_queue = None
+servicebus_flusher = None
+servicebus_max_batch_size = None
+# Messages the flusher has taken off servicebus_queue but not yet delivered
+servicebus_unsent = []
+
+# Accepted photograph uploads
+ALLOWED_CONTENT_TYPES = frozenset({"image/jpeg", "image/png", "image/webp", "image/gif"})
+ALLOWED_EXTENSIONS = frozenset({"jpg", "jpeg", "png", "webp", "gif"})
+SUBMISSION_FIELDS = ("name", "address", "id_number")
+
+# Text fields and part headers are capped while parsing; the Service Bus message
+# carrying the fields can't exceed a standard-tier 256 KiB batch anyway
+MAX_FIELD_SIZE = 256 * 1024
+MAX_PART_HEADER_SIZE = 8 * 1024
+
+# Photographs are staged on their blob in blocks of this size as the body arrives.
+# A request holds at most MAX_STAGED_BLOCKS blocks in flight, one block waiting
+# for a slot and one partially filled buffer, plus its capped text fields, so
+# upload memory per worker is bounded by MAX_INFLIGHT_UPLOADS *
+# ((MAX_STAGED_BLOCKS + 2) * BLOB_BLOCK_SIZE + len(SUBMISSION_FIELDS) * MAX_FIELD_SIZE),
+# i.e. 32 * 4.75 MiB = 152 MiB at the defaults.
+BLOB_BLOCK_SIZE = 1024 * 1024
+MAX_STAGED_BLOCKS = 2
+
+# Bound on request bodies being received at once; excess requests get a 503.
+# A client that sends nothing for UPLOAD_IDLE_TIMEOUT seconds, or hasn't finished
+# within UPLOAD_TIMEOUT, is dropped with 408 so stalled uploads free their slot.
+MAX_INFLIGHT_UPLOADS = int(os.getenv("MAX_INFLIGHT_UPLOADS", "32"))
+UPLOAD_SEM = asyncio.Semaphore(MAX_INFLIGHT_UPLOADS)
+UPLOAD_IDLE_TIMEOUT = float(os.getenv("UPLOAD_IDLE_TIMEOUT", "15"))
+UPLOAD_TIMEOUT = float(os.getenv("UPLOAD_TIMEOUT", "120"))
+
+# Bound on received submissions being committed, inserted and queued at once
+MAX_INFLIGHT_SUBMIT = int(os.getenv("MAX_INFLIGHT_SUBMIT", "16"))
+SUBMIT_SEM = asyncio.Semaphore(MAX_INFLIGHT_SUBMIT)
+
+# Service Bus messages are coalesced into batches for up to this many seconds
+SERVICEBUS_FLUSH_INTERVAL = float(os.getenv("SERVICEBUS_FLUSH_INTERVAL", "0.02"))
+# Failed sends are retried with exponential backoff between these delays
+SERVICEBUS_RETRY_DELAY = 1.0
+SERVICEBUS_RETRY_MAX_DELAY = 30.0
+# How long shutdown waits for queued messages to be delivered
+SERVICEBUS_DRAIN_TIMEOUT = 20.0
+# Submissions are refused with 503 once this many messages await delivery, so a
+# Service Bus outage can't grow the in-memory backlog without limit (messages are
+# at most one 256 KiB batch each, so 64 MiB worst case at the default)
+SERVICEBUS_BACKLOG = int(os.getenv("SERVICEBUS_BACKLOG", "256"))
+
+# Largest form_submissions.id (SERIAL), used when sizing messages before insert
+MAX_SUBMISSION_ID = 2**31 - 1
+
+# PostgreSQL pool sizing, overridable per container size
+PG_POOL_MIN = int(os.getenv("PG_POOL_MIN", "2"))
+PG_POOL_MAX = int(os.getenv("PG_POOL_MAX", "10"))
+
+# Advisory lock key serializing schema creation across workers
+SCHEMA_LOCK_ID = 7300212
+
+INSERT_SUBMISSION_SQL = """
+    INSERT INTO form_submissions (name, address, id_number, image_filename, blob_url)
+    VALUES ($1, $2, $3, $4, $5)
+    RETURNING id
+"""
+
+class SubmissionConnection(asyncpg.Connection):
+    """Pool connection that keeps the submission INSERT prepared for its lifetime"""
+    insert_submission = None
+
+async def prepare_connection(connection: SubmissionConnection):
+    """Prepare hot-path statements once per new pool connection"""
+    connection.insert_submission = await connection.prepare(INSERT_SUBMISSION_SQL)
+
+def servicebus_message_fits(message_data) -> bool:
+    """Check that the encoded message fits on its own in a Service Bus batch"""
+    batch = ServiceBusMessageBatch(max_size_in_bytes=servicebus_max_batch_size)
+    try:
+        batch.add_message(ServiceBusMessage(orjson.dumps(message_data)))
+    except MessageSizeExceededError:
+        return False
+    return True
+
+async def send_servicebus_unsent():
+    """Send servicebus_unsent in as few batches as fit, retrying with backoff until Service Bus accepts them"""
+    delay = SERVICEBUS_RETRY_DELAY
+    while servicebus_unsent:
+        try:
+            batch = await servicebus_sender.create_message_batch()
+            for message in servicebus_unsent:
+                try:
+                    batch.add_message(message)
+                except MessageSizeExceededError:
+                    break
+            if len(batch) == 0:
+                # submit_form size-checks every message, so this should never happen
+                logger.error("Dropping a Service Bus message larger than an empty batch")
+                del servicebus_unsent[0]
+                continue
+            await servicebus_sender.send_messages(batch)
+        except Exception as e:
+            logger.error(f"Failed to send {len(servicebus_unsent)} Service Bus messages, retrying in {delay:.0f}s: {e}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, SERVICEBUS_RETRY_MAX_DELAY)
+            continue
+        
+        del servicebus_unsent[:len(batch)]
+        delay = SERVICEBUS_RETRY_DELAY
+
+async def flush_servicebus_messages():
+    """Coalesce queued messages for up to SERVICEBUS_FLUSH_INTERVAL, then send them in batches
+    
+    Runs until it takes a None sentinel off servicebus_queue, sending whatever
+    was queued before it.
+    """
+    loop = asyncio.get_running_loop()
+    stopping = False
+    while not stopping:
+        message = await servicebus_queue.get()
+        if message is None:
+            return
+        
+        servicebus_unsent.append(message)
+        deadline = loop.time() + SERVICEBUS_FLUSH_INTERVAL
+        while True:
+            try:
+                message = await asyncio.wait_for(servicebus_queue.get(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if message is None:
+                stopping = True
+                break
+            servicebus_unsent.append(message)
+        
+        await send_servicebus_unsent()
 
 async def get_secret(secret_name: str) -> str:
-    """Retrieve secret from Azure Key Vault"""
+    """Retrieve secret from Azure Key Vault, cached for SECRET_CACHE_TTL seconds"""
+    cached = secret_cache.get(secret_name)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    
     try:
-        secret = secret_client.get_secret(secret_name)
-        return secret.value
+        secret = await secret_client.get_secret(secret_name)
     except Exception as e:
         logger.error(f"Failed to retrieve secret {secret_name}: {e}")
         # Fallback to environment variables for local development
         return os.getenv(secret_name.upper().replace("-", "_"))
+    
+    secret_cache[secret_name] = (secret.value, time.monotonic() + SECRET_CACHE_TTL)
+    return secret.value
 
 async def initialize_azure_clients():
     """Initialize Azure service clients"""
-    global db_pool, blob_service_client, servicebus_client
+    global http_session, secret_client, db_pool, blob_service_client, container_client
+    global servicebus_client, servicebus_sender, servicebus_queue, servicebus_flusher
+    global servicebus_max_batch_size
     
     try:
-        # Get secrets from Key Vault
-        storage_connection_string = await get_secret("storage-connection-string")
-        postgres_connection_string = await get_secret("postgres-connection-string")
-        servicebus_connection_string = await get_secret("servicebus-connection-string")
+        # One aiohttp session shared by the HTTP-based Azure SDK clients, configured
+        # like the sessions the SDK creates for itself (proxy env vars honoured, no
+        # cookies, response bodies left compressed for the SDK to handle)
+        http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60),
+            trust_env=True,
+            auto_decompress=False,
+            cookie_jar=aiohttp.DummyCookieJar()
+        )
+        
+        # Initialize Key Vault client
+        secret_client = SecretClient(
+            vault_url=key_vault_url,
+            credential=credential,
+            transport=AioHttpTransport(session=http_session, session_owner=False)
+        )
+        
+        # Get secrets from Key Vault concurrently
+        (
+            storage_connection_string,
+            postgres_connection_string,
+            servicebus_connection_string
+        ) = await asyncio.gather(
+            get_secret("storage-connection-string"),
+            get_secret("postgres-connection-string"),
+            get_secret("servicebus-connection-string")
+        )
         
         # Initialize Azure Blob Storage client
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
+        blob_service_client = BlobServiceClient.from_connection_string(
+            storage_connection_string,
+            transport=AioHttpTransport(session=http_session, session_owner=False)
+        )
+        container_client = blob_service_client.get_container_client("form-images")
+        try:
+            await container_client.create_container()
+        except ResourceExistsError:
+            pass
         
         # Initialize Service Bus client
         servicebus_client = ServiceBusClient.from_connection_string(servicebus_connection_string)
+        servicebus_sender = servicebus_client.get_queue_sender(queue_name="form-submission-job")
+        # Opening a batch also opens the link, which reports the queue's size limit
+        servicebus_max_batch_size = (await servicebus_sender.create_message_batch()).max_size_in_bytes
+        # Headroom for every submission past the SERVICEBUS_BACKLOG check, so an
+        # already stored submission can always enqueue its message
+        servicebus_queue = asyncio.Queue(maxsize=SERVICEBUS_BACKLOG + MAX_INFLIGHT_SUBMIT)
+        servicebus_flusher = asyncio.create_task(flush_servicebus_messages())
         
-        # Initialize PostgreSQL connection pool
-        db_pool = await asyncpg.create_pool(postgres_connection_string)
-        
-        # Create table if it doesn't exist
-        async with db_pool.acquire() as connection:
+        # Create table if it doesn't exist, before pool connections prepare against it.
+        # IF NOT EXISTS is not safe against concurrent creators, so every worker in
+        # every pod takes the same advisory lock around the DDL.
+        connection = await asyncpg.connect(postgres_connection_string)
+        try:
+            await connection.execute("SELECT pg_advisory_lock($1)", SCHEMA_LOCK_ID)
             await connection.execute("""
                 CREATE TABLE IF NOT EXISTS form_submissions (
                     id SERIAL PRIMARY KEY,
@@ -71,6 +294,34 @@ async def initialize_azure_clients():
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # CONCURRENTLY keeps inserts from older pods flowing while an index builds
+            # on a populated table; it cannot run inside a transaction, so each index
+            # is its own statement
+            await connection.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_form_submissions_id_number
+                    ON form_submissions (id_number)
+            """)
+            await connection.execute("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_form_submissions_created_at
+                    ON form_submissions (created_at DESC)
+            """)
+            await connection.execute("SELECT pg_advisory_unlock($1)", SCHEMA_LOCK_ID)
+        finally:
+            # Closing the session also releases the lock if the DDL failed
+            await connection.close()
+        
+        # Initialize PostgreSQL connection pool
+        db_pool = await asyncpg.create_pool(
+            postgres_connection_string,
+            min_size=PG_POOL_MIN,
+            max_size=PG_POOL_MAX,
+            max_queries=50000,
+            max_inactive_connection_lifetime=300.0,
+            command_timeout=10.0,
+            statement_cache_size=1024,
+            connection_class=SubmissionConnection,
+            init=prepare_connection
+        )
         
         logger.info("Azure clients initialized successfully")
         
@@ -86,140 +337,312 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up connections on shutdown"""
-    global db_pool
+    if servicebus_flusher:
+        # Drain queued submission messages before the sender closes
+        async def drain():
+            await servicebus_queue.put(None)
+            await servicebus_flusher
+        
+        try:
+            await asyncio.wait_for(drain(), SERVICEBUS_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            undelivered = servicebus_queue.qsize() + len(servicebus_unsent)
+            logger.error(f"Shut down with {undelivered} Service Bus messages undelivered")
     if db_pool:
         await db_pool.close()
+    if blob_service_client:
+        await blob_service_client.close()
+    if servicebus_sender:
+        await servicebus_sender.close()
+    if servicebus_client:
+        await servicebus_client.close()
+    if secret_client:
+        await secret_client.close()
+    await credential.close()
+    if http_session:
+        await http_session.close()
 
-@app.get("/", response_class=HTMLResponse)
-async def get_form():
-    """Serve the HTML form"""
-    return """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Form Submission</title>
-        <style>
-            body { font-family: Arial, sans-serif; max-width: 600px; margin: 50px auto; padding: 20px; }
-            .form-group { margin-bottom: 15px; }
-            label { display: block; margin-bottom: 5px; font-weight: bold; }
-            input, textarea { width: 100%; padding: 8px; border: 1px solid #ddd; border-radius: 4px; }
-            textarea { height: 100px; resize: vertical; }
-            button { background-color: #007bff; color: white; padding: 10px 20px; border: none; border-radius: 4px; cursor: pointer; }
-            button:hover { background-color: #0056b3; }
-            .success { color: green; margin-top: 10px; }
-            .error { color: red; margin-top: 10px; }
-        </style>
-    </head>
-    <body>
-        <h1>Form Submission</h1>
-        <form id="submissionForm" enctype="multipart/form-data">
-            <div class="form-group">
-                <label for="name">Name:</label>
-                <input type="text" id="name" name="name" required>
-            </div>
-            <div class="form-group">
-                <label for="address">Address:</label>
-                <textarea id="address" name="address" required></textarea>
-            </div>
-            <div class="form-group">
-                <label for="id_number">ID Number:</label>
-                <input type="text" id="id_number" name="id_number" required>
-            </div>
-            <div class="form-group">
-                <label for="photograph">Photograph:</label>
-                <input type="file" id="photograph" name="photograph" accept="image/*" required>
-            </div>
-            <button type="submit">Submit Form</button>
-        </form>
-        <div id="message"></div>
-
-        <script>
-            document.getElementById('submissionForm').addEventListener('submit', async function(e) {
-                e.preventDefault();
-                
-                const formData = new FormData(this);
-                const messageDiv = document.getElementById('message');
+class SubmissionStream:
+    """Push-mode multipart parser for /submit
+    
+    Text fields are collected in memory while the photograph part is buffered
+    only until a full blob block is available, so uploads never spool to disk.
+    """
+    
+    def __init__(self, boundary: bytes):
+        self.fields = {}
+        self.photograph_filename = None
+        self.photograph_content_type = None
+        self.photograph_done = False
+        self.buffer = bytearray()
+        self.part_name = None
+        self.part_headers = {}
+        self.part_data = bytearray()
+        self.header_field = b""
+        self.header_value = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished
+        })
+    
+    def on_part_begin(self):
+        self.part_name = None
+        self.part_headers = {}
+        self.part_data = bytearray()
+    
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+        self.check_header_size()
+    
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+        self.check_header_size()
+    
+    def check_header_size(self):
+        if len(self.header_field) + len(self.header_value) > MAX_PART_HEADER_SIZE:
+            raise HTTPException(status_code=413, detail="Form part header too large")
+    
+    def on_header_end(self):
+        self.part_headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+    
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.part_headers.get(b"content-disposition", b""))
+        self.part_name = options.get(b"name", b"").decode()
+        if self.part_name == "photograph":
+            if self.photograph_filename is not None:
+                # Only the first photograph part is uploaded
+                self.part_name = None
+                return
+            self.photograph_filename = options.get(b"filename", b"").decode()
+            self.photograph_content_type = self.part_headers.get(b"content-type", b"").decode()
+    
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.part_name == "photograph":
+            self.buffer += data[start:end]
+        elif self.part_name in SUBMISSION_FIELDS:
+            if len(self.part_data) + end - start > MAX_FIELD_SIZE:
+                raise HTTPException(status_code=413, detail=f"Form field {self.part_name} too large")
+            self.part_data += data[start:end]
+    
+    def on_part_end(self):
+        if self.part_name == "photograph":
+            self.photograph_done = True
+        elif self.part_name in SUBMISSION_FIELDS:
+            self.fields[self.part_name] = self.part_data.decode()
+    
+    def pop_blocks(self):
+        """Return the full blocks buffered so far, plus the remainder once the photograph has ended"""
+        blocks = []
+        while len(self.buffer) >= BLOB_BLOCK_SIZE:
+            blocks.append(bytes(self.buffer[:BLOB_BLOCK_SIZE]))
+            del self.buffer[:BLOB_BLOCK_SIZE]
+        if self.photograph_done and self.buffer:
+            blocks.append(bytes(self.buffer))
+            self.buffer.clear()
+        return blocks
+
+async def read_body(request: Request):
+    """Yield request body chunks, giving up with 408 when the client stalls or runs out of time"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + UPLOAD_TIMEOUT
+    chunks = request.stream()
+    while True:
+        timeout = min(UPLOAD_IDLE_TIMEOUT, deadline - loop.time())
+        try:
+            yield await asyncio.wait_for(anext(chunks), timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            logger.info("Timed out waiting for form submission body")
+            raise HTTPException(status_code=408, detail="Timed out receiving the request body")
+
+async def receive_submission(request: Request):
+    """Parse the /submit body as it arrives, staging the photograph on a new blob
+    
+    Returns the text fields, the blob client and the ids of the staged blocks,
+    which still have to be committed.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in options:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+    
+    stream = SubmissionStream(options[b"boundary"])
+    blob_client = None
+    block_ids = []
+    staging_tasks = []
+    pending = set()
+    
+    try:
+        async for chunk in read_body(request):
+            stream.parser.write(chunk)
+            
+            if blob_client is None and stream.photograph_content_type is not None:
+                # Validate file type
+                if stream.photograph_content_type not in ALLOWED_CONTENT_TYPES:
+                    raise HTTPException(status_code=400, detail="Unsupported image type")
                 
-                try {
-                    const response = await fetch('/submit', {
-                        method: 'POST',
-                        body: formData
-                    });
-                    
-                    const result = await response.json();
-                    
-                    if (response.ok) {
-                        messageDiv.innerHTML = '<div class="success">Form submitted successfully! ID: ' + result.submission_id + '</div>';
-                        this.reset();
-                    } else {
-                        messageDiv.innerHTML = '<div class="error">Error: ' + result.detail + '</div>';
+                # Generate unique filename
+                _, sep, extension = stream.photograph_filename.rpartition('.')
+                extension = extension.lower()
+                file_extension = extension if sep and extension in ALLOWED_EXTENSIONS else 'jpg'
+                # Time-ordered prefix keeps blob names sortable for downstream listing
+                unique_filename = f"{time.time_ns():020d}-{uuid.uuid4().hex[:12]}.{file_extension}"
+                blob_client = container_client.get_blob_client(unique_filename)
+            
+            # Stage full blocks in parallel, keeping at most MAX_STAGED_BLOCKS in flight
+            for block in stream.pop_blocks():
+                if len(pending) >= MAX_STAGED_BLOCKS:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()
+                block_id = f"{len(block_ids):08d}"
+                block_ids.append(block_id)
+                task = asyncio.create_task(blob_client.stage_block(block_id, block))
+                staging_tasks.append(task)
+                pending.add(task)
+        
+        stream.parser.finalize()
+        await asyncio.gather(*pending)
+    except (MultipartParseError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail="There was an error parsing the body") from e
+    except ClientDisconnect:
+        logger.info("Client disconnected during form submission upload")
+        raise HTTPException(status_code=400, detail="Client disconnected")
+    finally:
+        # No-op once every block is staged; abandons in-flight blocks on failure and
+        # retrieves every outcome so no task exception goes unobserved
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*staging_tasks, return_exceptions=True)
+    
+    missing = [field for field in SUBMISSION_FIELDS if field not in stream.fields]
+    if blob_client is None or not stream.photograph_done:
+        missing.append("photograph")
+    if missing:
+        raise HTTPException(status_code=422, detail=f"Missing form fields: {', '.join(missing)}")
+    
+    return stream.fields, blob_client, block_ids
+
+@app.get("/")
+async def get_form(request: Request):
+    """Serve the HTML form, gzipped when the client accepts it"""
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        etag, headers, response = INDEX_GZIP_ETAG, INDEX_GZIP_HEADERS, INDEX_GZIP_RESPONSE
+    else:
+        etag, headers, response = INDEX_ETAG, INDEX_HEADERS, INDEX_RESPONSE
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return response
+
+# /submit parses its body by hand, so its form contract is declared for OpenAPI here
+SUBMIT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["name", "address", "id_number", "photograph"],
+                    "properties": {
+                        "name": {"type": "string", "maxLength": 255, "description": "Full name"},
+                        "address": {"type": "string", "description": "Postal address"},
+                        "id_number": {"type": "string", "maxLength": 100, "description": "Identity document number"},
+                        "photograph": {
+                            "type": "string",
+                            "format": "binary",
+                            "description": "JPEG, PNG, WebP or GIF image"
+                        }
                     }
-                } catch (error) {
-                    messageDiv.innerHTML = '<div class="error">Error: ' + error.message + '</div>';
                 }
-            });
-        </script>
-    </body>
-    </html>
-    """
+            }
+        }
+    }
+}
 
-@app.post("/submit")
-async def submit_form(
-    name: str = Form(...),
-    address: str = Form(...),
-    id_number: str = Form(...),
-    photograph: UploadFile = File(...)
-):
-    """Handle form submission"""
-    try:
-        # Validate file type
-        if not photograph.content_type.startswith('image/'):
-            raise HTTPException(status_code=400, detail="File must be an image")
-        
-        # Generate unique filename
-        file_extension = photograph.filename.split('.')[-1] if '.' in photograph.filename else 'jpg'
-        unique_filename = f"{uuid.uuid4()}.{file_extension}"
-        
-        # Upload to Azure Blob Storage
-        container_name = "form-images"
-        blob_client = blob_service_client.get_blob_client(
-            container=container_name, 
-            blob=unique_filename
+@app.post("/submit", openapi_extra=SUBMIT_OPENAPI)
+async def submit_form(request: Request):
+    """Handle form submission, streaming the photograph to blob storage as it arrives"""
+    # Fail fast instead of queueing beyond MAX_INFLIGHT_UPLOADS / MAX_INFLIGHT_SUBMIT
+    if UPLOAD_SEM.locked() or SUBMIT_SEM.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": "1"}
         )
+    
+    try:
+        # Receiving the body is bounded separately from the downstream steps,
+        # so slow uploads can't starve the commit, insert and enqueue below
+        async with UPLOAD_SEM:
+            fields, blob_client, block_ids = await receive_submission(request)
         
-        # Read file content
-        file_content = await photograph.read()
-        
-        # Upload to blob storage
-        blob_client.upload_blob(file_content, overwrite=True)
+        name, address, id_number = (fields[field] for field in SUBMISSION_FIELDS)
+        unique_filename = blob_client.blob_name
         blob_url = blob_client.url
         
-        # Store metadata in PostgreSQL
-        async with db_pool.acquire() as connection:
-            submission_id = await connection.fetchval(
-                """
-                INSERT INTO form_submissions (name, address, id_number, image_filename, blob_url)
-                VALUES ($1, $2, $3, $4, $5)
-                RETURNING id
-                """,
-                name, address, id_number, unique_filename, blob_url
-            )
-        
-        # Send message to Service Bus Queue
         message_data = {
-            "submission_id": submission_id,
+            "submission_id": None,
             "name": name,
             "address": address,
             "id_number": id_number,
             "image_filename": unique_filename,
             "blob_url": blob_url,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.now(timezone.utc)
         }
         
-        sender = servicebus_client.get_queue_sender(queue_name="form-submission-job")
-        message = ServiceBusMessage(json.dumps(message_data))
-        sender.send_messages(message)
-        sender.close()
+        # Reject submissions whose queue message Service Bus could never accept
+        # before anything is stored
+        if not servicebus_message_fits({**message_data, "submission_id": MAX_SUBMISSION_ID}):
+            raise HTTPException(status_code=413, detail="Submission too large")
+        
+        async with SUBMIT_SEM:
+            # Refuse new submissions while Service Bus delivery is backed up
+            if servicebus_queue.qsize() >= SERVICEBUS_BACKLOG:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Submission queue is backed up, please retry shortly",
+                    headers={"Retry-After": "5"}
+                )
+            
+            # Commit the staged blocks while the metadata insert runs;
+            # only the Service Bus message needs both
+            upload_task = asyncio.create_task(blob_client.commit_block_list(block_ids))
+            
+            # Store metadata in PostgreSQL, committing only once the blob exists
+            # so a failed upload rolls the row back instead of orphaning it
+            try:
+                async with db_pool.acquire() as connection:
+                    async with connection.transaction():
+                        submission_id = await connection.insert_submission.fetchval(
+                            name, address, id_number, unique_filename, blob_url
+                        )
+                        await upload_task
+            finally:
+                # No-op once the upload has finished; abandons it if the insert failed
+                upload_task.cancel()
+                await asyncio.gather(upload_task, return_exceptions=True)
+            
+            # Queue message for the batching Service Bus flusher
+            message_data["submission_id"] = submission_id
+            message = ServiceBusMessage(orjson.dumps(message_data))
+            try:
+                servicebus_queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Unreachable while the queue keeps MAX_INFLIGHT_SUBMIT headroom
+                logger.error(f"Service Bus queue full, submission {submission_id} not queued")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Submission queue is backed up, please retry shortly",
+                    headers={"Retry-After": "5"}
+                )
         
         logger.info(f"Form submitted successfully with ID: {submission_id}")
         
@@ -229,15 +652,38 @@ async def submit_form(
             "blob_url": blob_url
         }
         
-    except Exception as e:
-        logger.error(f"Error processing form submission: {e}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+        # Caused by the submitted values (e.g. too long for the column); retrying won't help
+        logger.warning(f"Rejected form submission data: {e}")
+        raise HTTPException(status_code=422, detail="Invalid submission data")
+    except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError) as e:
+        logger.error(f"Database error processing form submission: {e!r}")
+        raise HTTPException(
+            status_code=503,
+            detail="Database unavailable, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
+    except AzureError as e:
+        logger.error(f"Azure error processing form submission: {e}")
+        raise HTTPException(
+            status_code=502,
+            detail="Storage service error, please retry shortly",
+            headers={"Retry-After": "5"}
+        )
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {"status": "healthy", "timestamp": time.time()}
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        backlog=2048
+    )
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import main
+
+BOUNDARY = "testboundary"
+
+
+def field(name, value):
+    """Encode a multipart text field"""
+    if isinstance(value, str):
+        value = value.encode()
+    return (f'Content-Disposition: form-data; name="{name}"\r\n\r\n').encode() + value
+
+
+def photograph(data, filename="photo.png", content_type="image/png"):
+    """Encode a multipart photograph part"""
+    return (
+        f'Content-Disposition: form-data; name="photograph"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data
+
+
+def multipart_body(*parts):
+    """Join encoded parts into a multipart/form-data body"""
+    delimiter = f"--{BOUNDARY}\r\n".encode()
+    return b"".join(delimiter + part + b"\r\n" for part in parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+def submission_body(data=b"\x89PNG image bytes", **overrides):
+    """Encode a complete, valid submission"""
+    fields = {"name": "Jane Doe", "address": "1 Main St", "id_number": "ID-42", **overrides}
+    return multipart_body(*(field(name, value) for name, value in fields.items()), photograph(data))
+
+
+def make_request(
+    body,
+    content_type=f"multipart/form-data; boundary={BOUNDARY}",
+    chunk_size=1000,
+    disconnect=False,
+    stall=False,
+):
+    """Build a /submit request whose body arrives in chunk_size pieces
+
+    With stall=True the client goes quiet after sending body, never finishing it.
+    """
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": disconnect or stall or i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    if disconnect:
+        messages.append({"type": "http.disconnect"})
+
+    async def receive():
+        if not messages:
+            await asyncio.Event().wait()
+        return messages.pop(0)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/submit",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    return Request(scope, receive)
+
+
+class FakeBlobClient:
+    def __init__(self, blob_name):
+        self.blob_name = blob_name
+        self.url = f"https://example.blob.core.windows.net/form-images/{blob_name}"
+        self.staged = {}
+        self.committed = None
+        self.commit_error = None
+
+    async def stage_block(self, block_id, data):
+        self.staged[block_id] = data
+
+    async def commit_block_list(self, block_ids):
+        if self.commit_error:
+            raise self.commit_error
+        self.committed = block_ids
+
+    def data(self):
+        return b"".join(self.staged[block_id] for block_id in sorted(self.staged))
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.blobs = []
+
+    def get_blob_client(self, blob_name):
+        blob_client = FakeBlobClient(blob_name)
+        self.blobs.append(blob_client)
+        return blob_client
+
+
+@pytest.fixture
+def container(monkeypatch):
+    container = FakeContainerClient()
+    monkeypatch.setattr(main, "container_client", container)
+    return container
+
+
+class FakeTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.connection.committed.extend(self.connection.pending)
+        self.connection.pending = []
+
+
+class FakeInsert:
+    def __init__(self, connection):
+        self.connection = connection
+        self.error = None
+
+    async def fetchval(self, *args):
+        if self.error:
+            raise self.error
+        self.connection.pending.append(args)
+        return len(self.connection.committed) + len(self.connection.pending)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.pending = []
+        self.committed = []
+        self.insert_submission = FakeInsert(self)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+class FakePool:
+    def __init__(self):
+        self.connection = FakeConnection()
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.connection
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+        return Acquire()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(main, "db_pool", pool)
+    return pool.connection
@@ -0,0 +1,230 @@
+import asyncio
+import gc
+
+import pytest
+from azure.core.exceptions import ServiceRequestError
+from fastapi import HTTPException
+
+import main
+from conftest import (
+    field,
+    make_request,
+    multipart_body,
+    photograph,
+    submission_body,
+)
+
+
+def receive(body, **kwargs):
+    return asyncio.run(main.receive_submission(make_request(body, **kwargs)))
+
+
+def test_fields_and_photograph_are_parsed(container):
+    fields, blob_client, block_ids = receive(submission_body(b"image bytes"), chunk_size=7)
+
+    assert fields == {"name": "Jane Doe", "address": "1 Main St", "id_number": "ID-42"}
+    assert blob_client is container.blobs[0]
+    assert blob_client.blob_name.endswith(".png")
+    assert block_ids == ["00000000"]
+    assert blob_client.data() == b"image bytes"
+
+
+def test_photograph_before_fields(container):
+    body = multipart_body(
+        photograph(b"image bytes"),
+        field("id_number", "ID-42"),
+        field("address", "1 Main St\r\nSpringfield"),
+        field("name", "José"),
+    )
+
+    fields, blob_client, _ = receive(body, chunk_size=5)
+
+    assert fields == {"name": "José", "address": "1 Main St\r\nSpringfield", "id_number": "ID-42"}
+    assert blob_client.data() == b"image bytes"
+
+
+def test_only_first_photograph_is_uploaded(container):
+    body = multipart_body(
+        field("name", "Jane Doe"),
+        field("address", "1 Main St"),
+        field("id_number", "ID-42"),
+        photograph(b"first"),
+        photograph(b"second", filename="other.gif", content_type="image/gif"),
+    )
+
+    _, blob_client, _ = receive(body)
+
+    assert len(container.blobs) == 1
+    assert blob_client.blob_name.endswith(".png")
+    assert blob_client.data() == b"first"
+
+
+def test_missing_photograph_is_rejected(container):
+    body = multipart_body(field("name", "Jane Doe"), field("address", "1 Main St"), field("id_number", "ID-42"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body)
+
+    assert excinfo.value.status_code == 422
+    assert excinfo.value.detail == "Missing form fields: photograph"
+
+
+def test_missing_fields_are_listed(container):
+    body = multipart_body(field("name", "Jane Doe"), photograph(b"image bytes"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body)
+
+    assert excinfo.value.status_code == 422
+    assert excinfo.value.detail == "Missing form fields: address, id_number"
+
+
+def test_unsupported_content_type_is_rejected_before_staging(container):
+    body = multipart_body(field("name", "Jane Doe"), photograph(b"GIF89a", content_type="image/svg+xml"))
+
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body)
+
+    assert excinfo.value.status_code == 400
+    assert container.blobs == []
+
+
+@pytest.mark.parametrize(
+    "size, block_sizes",
+    [
+        (main.BLOB_BLOCK_SIZE, [main.BLOB_BLOCK_SIZE]),
+        (2 * main.BLOB_BLOCK_SIZE, [main.BLOB_BLOCK_SIZE, main.BLOB_BLOCK_SIZE]),
+        (main.BLOB_BLOCK_SIZE + 1, [main.BLOB_BLOCK_SIZE, 1]),
+    ],
+)
+def test_photograph_is_split_into_blob_blocks(container, size, block_sizes):
+    data = bytes(range(256)) * (size // 256) + b"x" * (size % 256)
+
+    _, blob_client, block_ids = receive(submission_body(data), chunk_size=64 * 1024)
+
+    assert [len(blob_client.staged[block_id]) for block_id in block_ids] == block_sizes
+    assert blob_client.data() == data
+
+
+def test_staged_blocks_in_flight_are_bounded(container, monkeypatch):
+    in_flight = 0
+    peak = 0
+
+    async def slow_stage_block(self, block_id, data):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        self.staged[block_id] = data
+        in_flight -= 1
+
+    monkeypatch.setattr("conftest.FakeBlobClient.stage_block", slow_stage_block)
+    monkeypatch.setattr(main, "BLOB_BLOCK_SIZE", 16)
+
+    _, blob_client, block_ids = receive(submission_body(b"a" * 160), chunk_size=64)
+
+    assert len(block_ids) == 10
+    assert peak <= main.MAX_STAGED_BLOCKS
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"garbage--",
+        multipart_body(field("name", b"\xff\xfe")),
+        multipart_body(
+            b'Content-Disposition: form-data; name="photograph"; filename="\xff.png"\r\n'
+            b"Content-Type: image/png\r\n\r\nimage bytes"
+        ),
+    ],
+    ids=["garbage", "non-utf8-field", "non-utf8-filename"],
+)
+def test_malformed_body_is_rejected(container, body):
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body)
+
+    assert excinfo.value.status_code == 400
+    assert excinfo.value.detail == "There was an error parsing the body"
+
+
+def test_non_multipart_request_is_rejected(container):
+    with pytest.raises(HTTPException) as excinfo:
+        receive(b"name=Jane", content_type="application/x-www-form-urlencoded")
+
+    assert excinfo.value.status_code == 400
+
+
+def test_client_disconnect_is_a_client_error(container):
+    body = submission_body()[:50]
+
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body, disconnect=True)
+
+    assert excinfo.value.status_code == 400
+
+
+def test_openapi_declares_form_fields():
+    schema = main.app.openapi()["paths"]["/submit"]["post"]["requestBody"]["content"]["multipart/form-data"]["schema"]
+
+    assert schema["required"] == ["name", "address", "id_number", "photograph"]
+    assert schema["properties"]["photograph"]["format"] == "binary"
+
+
+def test_failed_staged_blocks_leave_no_unretrieved_task(container, monkeypatch):
+    async def failing_stage_block(self, block_id, data):
+        raise ServiceRequestError("connection reset")
+
+    monkeypatch.setattr("conftest.FakeBlobClient.stage_block", failing_stage_block)
+    monkeypatch.setattr(main, "BLOB_BLOCK_SIZE", 16)
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        with pytest.raises(ServiceRequestError):
+            await main.receive_submission(make_request(submission_body(b"a" * 160), chunk_size=64))
+
+    asyncio.run(run())
+    gc.collect()
+
+    assert unhandled == []
+
+
+def test_oversized_field_is_rejected_while_parsing(container, monkeypatch):
+    body = multipart_body(field("address", b"x" * (4 * main.MAX_FIELD_SIZE)), photograph(b"image bytes"))
+    chunks = []
+    request = make_request(body, chunk_size=64 * 1024)
+    stream = request.stream
+
+    async def counting_stream():
+        async for chunk in stream():
+            chunks.append(chunk)
+            yield chunk
+
+    monkeypatch.setattr(request, "stream", counting_stream)
+
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(main.receive_submission(request))
+
+    assert excinfo.value.status_code == 413
+    assert excinfo.value.detail == "Form field address too large"
+    assert sum(map(len, chunks)) < len(body)
+    assert container.blobs == []
+
+
+def test_field_at_the_limit_is_accepted(container):
+    body = submission_body(address="x" * main.MAX_FIELD_SIZE)
+
+    fields, _, _ = receive(body, chunk_size=64 * 1024)
+
+    assert len(fields["address"]) == main.MAX_FIELD_SIZE
+
+
+def test_oversized_part_header_is_rejected(container):
+    body = multipart_body(
+        b'Content-Disposition: form-data; name="name"; padding="' + b"x" * main.MAX_PART_HEADER_SIZE + b'"\r\n\r\nJane'
+    )
+
+    with pytest.raises(HTTPException) as excinfo:
+        receive(body)
+
+    assert excinfo.value.status_code == 413
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from azure.servicebus import ServiceBusMessage, ServiceBusMessageBatch
+from azure.servicebus.exceptions import ServiceBusConnectionError
+
+import main
+
+
+class FakeSender:
+    def __init__(self, failures=0, max_size=4096):
+        self.failures = failures
+        self.max_size = max_size
+        self.sent = []
+
+    async def create_message_batch(self):
+        return ServiceBusMessageBatch(max_size_in_bytes=self.max_size)
+
+    async def send_messages(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise ServiceBusConnectionError(message="link detached")
+        self.sent.append(len(batch))
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(main, "SERVICEBUS_RETRY_DELAY", 0)
+    monkeypatch.setattr(main, "SERVICEBUS_RETRY_MAX_DELAY", 0)
+    monkeypatch.setattr(main, "servicebus_unsent", [])
+
+
+def flush(sender, messages, monkeypatch):
+    async def run():
+        queue = asyncio.Queue()
+        monkeypatch.setattr(main, "servicebus_queue", queue)
+        monkeypatch.setattr(main, "servicebus_sender", sender)
+        for message in messages:
+            queue.put_nowait(message)
+        queue.put_nowait(None)
+        await main.flush_servicebus_messages()
+
+    asyncio.run(run())
+
+
+def test_queued_messages_are_sent_in_batches(monkeypatch):
+    sender = FakeSender(max_size=4096)
+
+    flush(sender, [ServiceBusMessage(b"x" * 1000) for _ in range(7)], monkeypatch)
+
+    assert sum(sender.sent) == 7
+    assert len(sender.sent) > 1
+
+
+def test_failed_send_is_retried_not_dropped(monkeypatch):
+    sender = FakeSender(failures=2)
+
+    flush(sender, [ServiceBusMessage(b"payload") for _ in range(3)], monkeypatch)
+
+    assert sender.sent == [3]
+
+
+def test_message_fits_check_uses_link_limit(monkeypatch):
+    monkeypatch.setattr(main, "servicebus_max_batch_size", 2048)
+
+    assert main.servicebus_message_fits({"address": "x" * 1000})
+    assert not main.servicebus_message_fits({"address": "x" * 4000})
+
+
+def test_shutdown_counts_undelivered_messages_held_by_flusher(monkeypatch, caplog):
+    sender = FakeSender(failures=1000)
+    monkeypatch.setattr(main, "SERVICEBUS_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(main, "SERVICEBUS_DRAIN_TIMEOUT", 0.05)
+    for name in ("db_pool", "blob_service_client", "servicebus_client", "secret_client", "http_session"):
+        monkeypatch.setattr(main, name, None)
+
+    class FakeCredential:
+        async def close(self):
+            pass
+
+    monkeypatch.setattr(main, "credential", FakeCredential())
+
+    async def run():
+        queue = asyncio.Queue(maxsize=4)
+        monkeypatch.setattr(main, "servicebus_queue", queue)
+        monkeypatch.setattr(main, "servicebus_sender", sender)
+        for _ in range(3):
+            queue.put_nowait(ServiceBusMessage(b"payload"))
+        monkeypatch.setattr(main, "servicebus_flusher", asyncio.create_task(main.flush_servicebus_messages()))
+        await asyncio.sleep(0.05)
+        for _ in range(4):
+            queue.put_nowait(ServiceBusMessage(b"payload"))
+        await main.shutdown_event()
+
+    asyncio.run(run())
+
+    assert "Shut down with 7 Service Bus messages undelivered" in caplog.text
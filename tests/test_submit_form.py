@@ -0,0 +1,157 @@
+import asyncio
+
+import asyncpg
+import pytest
+from azure.core.exceptions import ServiceRequestError
+from fastapi import HTTPException
+
+import main
+from conftest import make_request, submission_body
+
+
+@pytest.fixture(autouse=True)
+def queue(monkeypatch):
+    queue = asyncio.Queue()
+    monkeypatch.setattr(main, "servicebus_queue", queue)
+    monkeypatch.setattr(main, "servicebus_max_batch_size", 256 * 1024)
+    return queue
+
+
+def submit(body, **kwargs):
+    return asyncio.run(main.submit_form(make_request(body, **kwargs)))
+
+
+def test_submission_commits_row_after_upload(container, db, queue):
+    response = submit(submission_body(b"image bytes"))
+
+    blob_client = container.blobs[0]
+    assert blob_client.committed == ["00000000"]
+    assert db.committed == [("Jane Doe", "1 Main St", "ID-42", blob_client.blob_name, blob_client.url)]
+    assert response["submission_id"] == 1
+    assert response["blob_url"] == blob_client.url
+    assert queue.qsize() == 1
+
+
+def test_failed_upload_rolls_back_row(container, db, monkeypatch):
+    async def failing_commit(self, block_ids):
+        raise ServiceRequestError("connection reset")
+
+    monkeypatch.setattr("conftest.FakeBlobClient.commit_block_list", failing_commit)
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body())
+
+    assert excinfo.value.status_code == 502
+    assert db.committed == []
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        asyncpg.StringDataRightTruncationError("value too long for type character varying(255)"),
+        asyncpg.NotNullViolationError("null value in column"),
+    ],
+)
+def test_invalid_data_is_not_retryable(container, db, error):
+    db.insert_submission.error = error
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body(name="x" * 300))
+
+    assert excinfo.value.status_code == 422
+    assert not excinfo.value.headers
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        asyncpg.CannotConnectNowError("the database system is starting up"),
+        asyncio.TimeoutError(),
+        ConnectionRefusedError(),
+    ],
+)
+def test_database_unavailable_is_retryable(container, db, error):
+    db.insert_submission.error = error
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body())
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "5"}
+
+
+def test_message_too_large_for_service_bus_is_rejected_before_storing(container, db, queue, monkeypatch):
+    monkeypatch.setattr(main, "servicebus_max_batch_size", 2048)
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body(address="x" * 4096))
+
+    assert excinfo.value.status_code == 413
+    assert container.blobs[0].committed is None
+    assert db.committed == []
+    assert queue.empty()
+
+
+
+def test_saturated_server_rejects_with_retry_after(container, db, monkeypatch):
+    monkeypatch.setattr(main, "SUBMIT_SEM", asyncio.Semaphore(0))
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body())
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+    assert container.blobs == []
+
+
+def test_stalled_uploads_do_not_hold_submit_slots(container, db, monkeypatch):
+    monkeypatch.setattr(main, "SUBMIT_SEM", asyncio.Semaphore(2))
+    monkeypatch.setattr(main, "UPLOAD_SEM", asyncio.Semaphore(3))
+
+    async def run():
+        stalled = [
+            asyncio.create_task(main.submit_form(make_request(submission_body()[:100], stall=True)))
+            for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        response = await main.submit_form(make_request(submission_body()))
+        for task in stalled:
+            task.cancel()
+        await asyncio.gather(*stalled, return_exceptions=True)
+        return response
+
+    response = asyncio.run(run())
+
+    assert response["submission_id"] == 1
+
+
+def test_stalled_upload_times_out(container, db, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_IDLE_TIMEOUT", 0.01)
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body()[:100], stall=True)
+
+    assert excinfo.value.status_code == 408
+
+
+def test_slow_upload_hits_overall_deadline(container, db, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_TIMEOUT", 0)
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body())
+
+    assert excinfo.value.status_code == 408
+
+
+def test_backed_up_service_bus_queue_rejects_before_storing(container, db, queue, monkeypatch):
+    monkeypatch.setattr(main, "SERVICEBUS_BACKLOG", 2)
+    queue.put_nowait(object())
+    queue.put_nowait(object())
+
+    with pytest.raises(HTTPException) as excinfo:
+        submit(submission_body())
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "5"}
+    assert container.blobs[0].committed is None
+    assert db.committed == []